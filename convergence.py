@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# Benchmarks how many games the RL players need to become undefeatable
+#
+# Copyright (C) 2020  Arijit Shaw
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2
+# of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import time
+import random
+import argparse
+import numpy as np
+from ttt import GameDB
+from state import evalBoard
+from game_engine import GameEngine
+from value_iteration import StateGraph, compare_policies
+
+"""
+A player is undefeatable if it never loses, neither as X nor as O,
+whatever the opponent plays. This is checked exactly by walking the game
+tree: the player takes its greedy move, the opponent tries all moves.
+
+Learners are compared on
+    - the stored traces in ttt_traces.txt, in the order they were played
+      (there are too few of them to become undefeatable, so the share of
+      boards where the learnt move is optimal is reported too)
+    - self-play games, where the learner plays both sides and takes
+      a random move with probability EPSILON
+"""
+
+EPSILON = 0.2
+MAX_SELF_PLAY = 3000
+SEEDS = range(5)
+
+def play(board, move):
+    """
+    board after a move, X moves when odd number of positions are empty
+    """
+    mark = 'X' if board.count('.') % 2 else 'O'
+    return board[:move] + mark + board[move+1:]
+
+def can_lose(player, board, me, memo):
+    """
+    Checks whether the opponent can force a win against player's
+    greedy moves, starting from a board
+
+    Parameters
+    ----------
+    player : GameEngine object
+    board : str
+    me : str
+        "X"/"O", side the player is playing
+    memo : dict(str:bool)
+        already checked boards
+    """
+    if board in memo:
+        return memo[board]
+    result = evalBoard(board)
+    if result == '/':
+        lose = False
+    elif result != '.':
+        lose = result != me
+    else:
+        available_moves = [m for m in range(9) if board[m] == '.']
+        my_move = (board.count('.') % 2 == 1) == (me == 'X')
+        if my_move:
+            move = player.greedy_move(board, available_moves)
+            lose = can_lose(player, play(board, move), me, memo)
+        else:
+            lose = any(can_lose(player, play(board, m), me, memo) \
+                            for m in available_moves)
+    memo[board] = lose
+    return lose
+
+def is_undefeatable(player):
+    """
+    Checks the player never loses, whichever side it plays
+    """
+    return not can_lose(player, '.........', 'X', dict()) \
+            and not can_lose(player, '.........', 'O', dict())
+
+def self_play_game(player, rng):
+    """
+    A game where the player plays both sides, with random exploration
+    """
+    board = '.........'
+    trace = []
+    while evalBoard(board) == '.':
+        available_moves = [m for m in range(9) if board[m] == '.']
+        if rng.random() < EPSILON:
+            move = rng.choice(available_moves)
+        else:
+            move = player.greedy_move(board, available_moves)
+        trace.append(move)
+        board = play(board, move)
+    return trace
+
+def games_to_undefeatable(player, games):
+    """
+    Learns from games one by one, until the player is undefeatable
+
+    Parameters
+    ----------
+    player : GameEngine object
+        untrained player
+    games : iterable(list(int))
+        traces to learn from
+
+    Returns
+    -------
+    n : int
+        number of games learnt, None if never undefeatable
+    """
+    for n, trace in enumerate(games):
+        player.learn_from(trace)
+        if is_undefeatable(player):
+            return n + 1
+    return None
+
+def self_play_games(player, rng):
+    for _ in range(MAX_SELF_PLAY):
+        yield self_play_game(player, rng)
+
+def describe(result):
+    return "never" if result is None else str(result)
+
+if __name__ == "__main__":
+    """
+    Compares one-step Q-Learning against TD(lambda) learners
+    """
+    # TD(0) has no eligibility traces, but learns from draws and backs up
+    # the next state like TD(lambda); it separates the effect of lambda
+    learners = [("one-step", None), ("TD(0)", 0.0), ("TD(0.5)", 0.5),
+                ("TD(0.8)", 0.8), ("TD(0.95)", 0.95)]
+    game_db = GameDB("ttt_traces.txt")
+    game_db.read_all_games()
+    args = argparse.Namespace(verb=False, rl=True, no_train=True, vi=False,
+                                td_lambda=None)
+    player = GameEngine(args, game_db.db)
+    graph = StateGraph(args)
+    graph.value_iteration()
+
+    print("games needed to become undefeatable")
+    print("%-10s %8s %9s  %s" %("learner", "traces", "optimal",
+                                    "self-play (seeds)"))
+    for name, td_lambda in learners:
+        start = time.time()
+        player.args = argparse.Namespace(verb=False, rl=True, no_train=True,
+                                            vi=False, td_lambda=td_lambda)
+        player.ql_table = np.zeros((player.num_states,9))
+        on_traces = games_to_undefeatable(player, game_db.db)
+        optimal, trained, total = compare_policies(graph, player)
+
+        on_self_play = []
+        for seed in SEEDS:
+            player.ql_table = np.zeros((player.num_states,9))
+            rng = random.Random(seed)
+            on_self_play.append(games_to_undefeatable(player,
+                                    self_play_games(player, rng)))
+        end = time.time()
+        print("%-10s %8s %8.1f%%  %s  (%.1f sec)" %(name,
+                describe(on_traces), 100.0 * optimal / total,
+                " ".join(describe(n) for n in on_self_play), end - start))
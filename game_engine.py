@@ -21,6 +21,7 @@ import time
 import random
 import numpy as np
 from state import State
+from value_iteration import StateGraph
 
 class GameEngine:
     """ A class for the AI based player "computer"
@@ -36,15 +37,26 @@ class GameEngine:
         Q-Learning scores are stored here
     traces : list(str)
         traces to learn from
+    elig_rows, elig_cols, elig_values : numpy arrays
+        eligibility traces of (state,action) pairs for TD(lambda),
+        preallocated for the longest sequence of a player
     all_states : dict()
         list of all possible states
+    solved : bool
+        Q-Learning table is exact (filled by solve()), no more learning
 
     Methods
     -------
     update_sequence(sequence, score)
         take a sequence of moves and update score for all its equivalent games
+    update_sequence_td(sequence, score)
+        same as update_sequence, using TD(lambda) with eligibility traces
     learn_from(trace)
         take a trace and learn from it
+    solve()
+        fill Q-Learning table exactly by value iteration over all states
+    greedy_move(s, available_moves)
+        best move at a board according to Q-Learning table
     next_turn(TicTacToe object)
         decide next best move based on Q-Learning algorithm / randomly
     """
@@ -56,15 +68,22 @@ class GameEngine:
         self.all_states = state.all_states
         self.num_states = len(list(state.all_states))
         self.ql_table = np.zeros((self.num_states,9))
+        # a player makes at most 5 moves, each with at most 8 equivalents
+        self.elig_rows = np.zeros(5*8, dtype=int)
+        self.elig_cols = np.zeros(5*8, dtype=int)
+        self.elig_values = np.zeros(5*8)
         self.traces = traces
         self.args = args
+        self.solved = False
         end = time.time()
         print("c time taken in initialization : %.2f sec" %(end - start))
 
-        if not args.no_train:
+        if args.vi:
+            self.solve()
+        elif not args.no_train:
             for trace in traces:
                 self.learn_from(trace)
-        print("c learnt from",len(traces),"traces")
+            print("c learnt from",len(traces),"traces")
         end2 = time.time()
         print("c time taken in learning : %.2f sec"%(end2 - end))
 
@@ -108,6 +127,54 @@ class GameEngine:
                 #    print("new_value %.2f"\
                 #        %self.ql_table[self.all_states[move[0]],move[1]])
 
+    def update_sequence_td(self,seq,reward):
+        """
+        updates scores in Q-Learning table with TD(lambda)
+        Parameter for learning :
+            discount factor (d) : 0.99
+            learning rate   (l) : 0.8
+            trace decay     (L) : from option --td-lambda
+            reward          (r) : +100 / -100 / 0, only after last move
+        Formula, for each move in the order they were played :
+            delta = r + d * max(Q(next_state,action)) - Q(state,action)
+            e(state,action) = 1
+            Q += l * delta * e  ,  then  e *= d * L
+        All the moves played so far are updated by every delta, so the
+        reward reaches the first move within a single game.
+
+        Parameters
+        ----------
+        seq : list((state:move))
+            sequence of moves of a player, as in update_sequence
+        reward : int
+            reward at the end of the game
+        """
+        discount = 0.99
+        learning = 0.8
+        decay = discount * self.args.td_lambda
+        if self.args.verb:
+            print("TD updating scores by", reward ,"for (class,step)",seq)
+        num_elig = 0
+        for i, move_list in enumerate(seq):
+            state, action = move_list[0]
+            if i == len(seq) - 1:
+                target = reward
+            else:
+                next_state = seq[i+1][0][0]
+                next_scores = self.ql_table[self.all_states[next_state]]
+                target = discount * max(next_scores[m] for m in range(9) \
+                                                if next_state[m] == '.')
+            delta = target - self.ql_table[self.all_states[state],action]
+
+            self.elig_values[:num_elig] *= decay
+            for move in move_list:
+                self.elig_rows[num_elig] = self.all_states[move[0]]
+                self.elig_cols[num_elig] = move[1]
+                self.elig_values[num_elig] = 1
+                num_elig += 1
+            self.ql_table[self.elig_rows[:num_elig],self.elig_cols[:num_elig]]\
+                += learning * delta * self.elig_values[:num_elig]
+
     def learn_from(self,trace):
         """
         Learn from a game's trace
@@ -116,12 +183,16 @@ class GameEngine:
                         all steps of player 2 are rewarded negatively
                         both with some decay for older steps
         If player 2 wins, reward is of opposite polarity
+        With TD(lambda), drawn matches are learnt too, with zero reward
+
+        If Q-Learning table is already solved exactly, nothing is learnt
 
         Parameters
         ----------
         trace : list(int)
             trace indicating moves taken in a game
         """
+        if self.solved: return
 
         seq_p1 = []
         seq_p2 = []
@@ -148,18 +219,61 @@ class GameEngine:
             is_p1_move = not is_p1_move
         who_wins = state.is_game_over()
 
+        if who_wins == 'X': assert(len(trace) % 2 == 1)
+        if who_wins == 'O': assert(len(trace) % 2 == 0)
+
+        if self.args.td_lambda is not None:
+            # unfinished games are not learnt, same as below
+            if not who_wins: return
+            rewards = {'X':(100,-100), 'O':(-100,100), 'draw':(0,0)}
+            self.update_sequence_td(seq_p1, rewards[who_wins][0])
+            self.update_sequence_td(seq_p2, rewards[who_wins][1])
+            return
+
         # p1 wins
         if who_wins == 'X':
-            assert(len(trace) % 2 == 1)
             self.update_sequence(seq_p1, 100)
             self.update_sequence(seq_p2,-100)
 
         # p2 wins
         if who_wins == 'O':
-            assert(len(trace) % 2 == 0)
             self.update_sequence(seq_p1,-100)
             self.update_sequence(seq_p2, 100)
 
+    def solve(self):
+        """
+        Fill Q-Learning table by value iteration over the full game graph
+        instead of learning from traces. See value_iteration.py
+        """
+        graph = StateGraph(self.args)
+        sweeps = graph.value_iteration()
+        graph.fill(self.ql_table, self.all_states)
+        self.solved = True
+        print("c solved", len(graph.boards), "boards in", sweeps, "sweeps")
+
+    def greedy_move(self, s, available_moves):
+        """
+        Best move at a board according to Q-Learning table
+        Among moves with equal score, the last one is chosen
+
+        Parameters
+        ----------
+        s : str
+            board state
+        available_moves : list(int)
+            moves available at the board
+
+        Returns
+        -------
+        move : int
+        """
+        scores = self.ql_table[self.all_states[s]]
+        tuple_list = [(m, scores[m]) for m in available_moves]
+        if self.args.verb: print(tuple_list)
+        tuple_list.sort(key=lambda tup: tup[1])
+        if self.args.verb: print("sorted",tuple_list)
+        return tuple_list[-1][0]
+
     def next_turn(self,game):
         """
         Computer's method to decide best next move
@@ -177,13 +291,9 @@ class GameEngine:
         """
         assert(len(game.state.available_moves))
         if self.args.rl:
-            scores = self.ql_table[self.all_states[game.state.s]]
             if self.args.verb: print(game.state.available_moves)
-            tuple_list = [(m, scores[m]) for m in game.state.available_moves]
-            if self.args.verb: print(tuple_list)
-            tuple_list.sort(key=lambda tup: tup[1])
-            if self.args.verb: print("sorted",tuple_list)
-            com_move = tuple_list[-1][0]
+            com_move = self.greedy_move(game.state.s,
+                                        game.state.available_moves)
             if self.args.verb:
                 print("available_moves :", game.state.available_moves)
             print("Computer taking RL move   :", com_move+1)
@@ -201,7 +201,16 @@ def running_options():
 					help='Use simple RL based player')
 	parser.add_argument('--no-train', dest='no_train', action='store_true',
 					help='Do not train with existing traces')
+	parser.add_argument('--td-lambda', dest='td_lambda', type=float,
+					metavar='LAMBDA', default=None,
+					help='Learn with TD(lambda) and eligibility traces, \
+						with the given trace decay')
+	parser.add_argument('--vi', dest='vi', action='store_true',
+					help='Fill RL player\'s table by value iteration, \
+						instead of training with existing traces')
 	args = parser.parse_args()
+	if args.td_lambda is not None and not 0 <= args.td_lambda <= 1:
+		parser.error('--td-lambda must be between 0 and 1')
 	return args
 
 
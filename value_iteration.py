@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# Builds the full game graph of TicTacToe and solves it by value iteration
+#
+# Copyright (C) 2020  Arijit Shaw
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2
+# of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+import time
+import argparse
+import numpy as np
+from state import State
+
+"""
+Q-Learning from traces only scores the states seen in stored games.
+TicTacToe is small enough to enumerate every board reachable from the
+empty board (5478 of them), so the Q-values can be computed exactly.
+
+The graph is stored in CSR form: edges going out of board i are
+    indices[indptr[i]:indptr[i+1]]     (boards reached)
+    moves[indptr[i]:indptr[i+1]]       (move taken)
+    rewards[indptr[i]:indptr[i+1]]     (reward for the player moving)
+
+Scores are always from the point of view of the player who moves, same
+as in the Q-learning table. Therefore the value of the next board is
+negated while backing up (the opponent plays next):
+    Q(state,action) = r + d * ( - max(Q(next_state,action)) )
+"""
+
+REWARD_WIN = 100
+REWARD_DRAW = 0
+DISCOUNT = 0.99
+
+class StateGraph:
+    """ A class for the complete graph of reachable TicTacToe boards
+
+    Attributes
+    ----------
+    boards : list(str)
+        all reachable boards, boards[0] is the empty board
+    index : dict(str:int)
+        position of each board in boards
+    terminal : numpy array (bool)
+        whether the game is over at a board
+    indptr, indices, moves, rewards : numpy arrays
+        CSR adjacency of the graph (see above)
+    q_values : numpy array
+        Q-value of each edge, filled by value_iteration()
+
+    Methods
+    -------
+    build()
+        enumerates all reachable boards and transitions
+    value_iteration(discount : float, optional)
+        runs batched Bellman sweeps until Q-values converge
+    fill(ql_table, all_states)
+        copies the computed Q-values to a Q-learning table
+    best_moves(board)
+        set of optimal moves at a board
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.boards = []
+        self.index = dict()
+        self.q_values = None
+        self.build()
+
+    def build(self):
+        """
+        enumerates all reachable boards and transitions in BFS order
+        """
+        state = State(self.args)
+        self.boards = [state.s]
+        self.index = {state.s: 0}
+        terminal = []
+        indptr = [0]
+        indices = []
+        moves = []
+        rewards = []
+
+        i = 0
+        while i < len(self.boards):
+            state.s = self.boards[i]
+            state.reconstruct_available_moves()
+            terminal.append(bool(state.is_game_over()))
+            if not terminal[-1]:
+                for move in list(state.available_moves):
+                    state.s = self.boards[i]
+                    state.set(move)
+                    if state.s not in self.index:
+                        self.index[state.s] = len(self.boards)
+                        self.boards.append(state.s)
+                    result = state.is_game_over()
+                    indices.append(self.index[state.s])
+                    moves.append(move)
+                    if result == "draw":
+                        rewards.append(REWARD_DRAW)
+                    elif result:
+                        rewards.append(REWARD_WIN)
+                    else:
+                        rewards.append(0)
+            indptr.append(len(indices))
+            i += 1
+
+        self.terminal = np.array(terminal)
+        self.indptr = np.array(indptr)
+        self.indices = np.array(indices)
+        self.moves = np.array(moves)
+        self.rewards = np.array(rewards, dtype=float)
+
+    def value_iteration(self, discount = DISCOUNT):
+        """
+        runs batched Bellman sweeps over all edges at once
+        Game has depth 9, so at most 10 sweeps are needed to converge
+
+        Parameters
+        ----------
+        discount : float
+            discount factor (d) in the formula above
+
+        Returns
+        -------
+        sweeps : int
+            number of sweeps taken to converge
+        """
+        num_boards = len(self.boards)
+        inner = np.flatnonzero(~self.terminal)
+        starts = self.indptr[inner]
+        # terminal boards have no edges and keep value 0
+        continues = ~self.terminal[self.indices]
+        value = np.zeros(num_boards)
+        sweeps = 0
+        while True:
+            sweeps += 1
+            q = self.rewards - discount * value[self.indices] * continues
+            new_value = np.zeros(num_boards)
+            new_value[inner] = np.maximum.reduceat(q, starts)
+            if np.array_equal(new_value, value):
+                break
+            value = new_value
+        self.q_values = q
+        return sweeps
+
+    def fill(self, ql_table, all_states):
+        """
+        copies the computed Q-values to a Q-learning table
+
+        Parameters
+        ----------
+        ql_table : numpy matrix (num_states x 9)
+            Q-Learning table of a GameEngine
+        all_states : dict(str:int)
+            row of ql_table for each board
+        """
+        assert(self.q_values is not None)
+        rows = np.array([all_states[b] for b in self.boards])
+        counts = np.diff(self.indptr)
+        ql_table[np.repeat(rows, counts), self.moves] = self.q_values
+
+    def best_moves(self, board):
+        """
+        set of optimal moves at a board, according to computed Q-values
+        """
+        i = self.index[board]
+        q = self.q_values[self.indptr[i]:self.indptr[i+1]]
+        moves = self.moves[self.indptr[i]:self.indptr[i+1]]
+        return set(moves[np.isclose(q, q.max())])
+
+def compare_policies(graph, player):
+    """
+    Compares moves chosen by a (trace-trained) GameEngine against the
+    optimal moves found by value iteration
+
+    Parameters
+    ----------
+    graph : StateGraph object
+        graph already solved with value_iteration()
+    player : GameEngine object
+
+    Returns
+    -------
+    (optimal, trained, total) : tuple(int)
+        optimal : boards where player's move is an optimal one
+        trained : boards where player has a non-zero Q-value
+        total   : all non-terminal boards
+    """
+    optimal = 0
+    trained = 0
+    total = 0
+    for i, board in enumerate(graph.boards):
+        if graph.terminal[i]:
+            continue
+        total += 1
+        available_moves = [m for m in range(9) if board[m] == '.']
+        if player.ql_table[player.all_states[board]].any():
+            trained += 1
+        if player.greedy_move(board, available_moves) in \
+                graph.best_moves(board):
+            optimal += 1
+    return optimal, trained, total
+
+if __name__ == "__main__":
+    """
+    Solves the game by value iteration and compares the resulting policy
+    against the one learnt from stored traces
+    """
+    from ttt import GameDB
+    from game_engine import GameEngine
+
+    args = argparse.Namespace(verb=False, rl=True, no_train=False, vi=False,
+                                td_lambda=None)
+    game_db = GameDB("ttt_traces.txt")
+    game_db.read_all_games()
+    player = GameEngine(args, game_db.db)
+
+    start = time.time()
+    graph = StateGraph(args)
+    end = time.time()
+    print("c built graph of", len(graph.boards), "boards and",
+            len(graph.indices), "moves in %.3f sec" %(end - start))
+    sweeps = graph.value_iteration()
+    end2 = time.time()
+    print("c value iteration converged in", sweeps,
+            "sweeps, %.3f sec" %(end2 - end))
+
+    optimal, trained, total = compare_policies(graph, player)
+    print("trace-trained Q-values cover %d of %d boards" %(trained, total))
+    print("trace-trained policy is optimal at %d of %d boards (%.1f%%)"
+            %(optimal, total, 100.0 * optimal / total))
+
+    graph.fill(player.ql_table, player.all_states)
+    optimal, trained, total = compare_policies(graph, player)
+    print("value iteration policy is optimal at %d of %d boards (%.1f%%)"
+            %(optimal, total, 100.0 * optimal / total))